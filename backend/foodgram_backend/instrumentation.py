@@ -0,0 +1,180 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.decorators import (api_view, permission_classes,
+                                       renderer_classes)
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+IN_CLAUSE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.app_duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_bytes = 0
+        self.n_plus_one = 0
+
+
+class MetricsRegistry:
+    histograms = (
+        ('foodgram_request_duration_seconds', 'duration'),
+        ('foodgram_request_db_duration_seconds', 'db_duration'),
+        ('foodgram_request_app_duration_seconds', 'app_duration'),
+        ('foodgram_request_queries', 'queries'),
+    )
+
+    def __init__(self):
+        self.views = defaultdict(ViewMetrics)
+        self.lock = threading.Lock()
+
+    def record(self, view, duration, db_duration, queries, response_bytes,
+               n_plus_one):
+        with self.lock:
+            metrics = self.views[view]
+            metrics.duration.observe(duration)
+            metrics.db_duration.observe(db_duration)
+            metrics.app_duration.observe(duration - db_duration)
+            metrics.queries.observe(queries)
+            metrics.response_bytes += response_bytes
+            metrics.n_plus_one += bool(n_plus_one)
+
+    def export(self):
+        with self.lock:
+            views = [
+                (view.replace('\\', '\\\\').replace('"', '\\"'), metrics)
+                for view, metrics in sorted(self.views.items())
+            ]
+            lines = []
+            for name, attribute in self.histograms:
+                lines.append(f'# TYPE {name} histogram')
+                for view, metrics in views:
+                    lines.extend(getattr(metrics, attribute).lines(
+                        name, f'view="{view}"'))
+            lines.append('# TYPE foodgram_response_bytes_total counter')
+            lines.extend(
+                f'foodgram_response_bytes_total{{view="{view}"}} '
+                f'{metrics.response_bytes}' for view, metrics in views)
+            lines.append('# TYPE foodgram_n_plus_one_total counter')
+            lines.extend(
+                f'foodgram_n_plus_one_total{{view="{view}"}} '
+                f'{metrics.n_plus_one}' for view, metrics in views)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[IN_CLAUSE.sub('(%s...)', sql)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count > threshold]
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view = self.get_view_name(request)
+        repeated = recorder.repeated(
+            settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+        response_bytes = (0 if response.streaming
+                          else len(response.content))
+        registry.record(view, duration, recorder.duration, recorder.count,
+                        response_bytes, repeated)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f}, '
+            f'app;dur={(duration - recorder.duration) * 1000:.1f}')
+        for shape, count in repeated:
+            logger.warning('Possible N+1 in %s: %d queries like %s',
+                           view, count, shape)
+        if duration * 1000 > settings.INSTRUMENTATION_SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request %s: %.1f ms, %d queries, %.1f ms in db',
+                view, duration * 1000, recorder.count,
+                recorder.duration * 1000)
+        return response
+
+    def get_view_name(self, request):
+        match = request.resolver_match
+        if match is None:
+            return f'{request.method} unresolved'
+        route = match.route.replace('/^', '/').lstrip('^').rstrip('$')
+        return f'{request.method} /{route}'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([PrometheusRenderer])
+def metrics(request):
+    return Response(registry.export())
@@ -39,6 +39,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+INSTRUMENTATION_ENABLED = bool(os.getenv('INSTRUMENTATION_ENABLED'))
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(
+    os.getenv('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5))
+INSTRUMENTATION_SLOW_REQUEST_MS = float(
+    os.getenv('INSTRUMENTATION_SLOW_REQUEST_MS', 500))
+
+if INSTRUMENTATION_ENABLED:
+    MIDDLEWARE.insert(
+        0, 'foodgram_backend.instrumentation.InstrumentationMiddleware')
+
 ROOT_URLCONF = 'foodgram_backend.urls'
 
 TEMPLATES = [
@@ -61,7 +71,7 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
@@ -70,6 +80,20 @@ DATABASES = {
     }
 }
 
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -113,6 +137,36 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': int(os.getenv('PAGE_SIZE', 6)),
 }
 
+CATALOGUE_CACHE_ALIAS = os.getenv('CATALOGUE_CACHE_ALIAS')
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 300))
+RECIPE_CACHE_ALIAS = os.getenv('RECIPE_CACHE_ALIAS', 'default')
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+RECIPE_IMAGE_MAX_BYTES = int(os.getenv(
+    'RECIPE_IMAGE_MAX_BYTES', 5 * 1024 * 1024
+))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+RECIPE_NEIGHBOURS = int(os.getenv('RECIPE_NEIGHBOURS', 20))
+RECOMMENDED_RECIPES_LIMIT = int(os.getenv('RECOMMENDED_RECIPES_LIMIT', 20))
+TIMELINE_INLINE_FAN_OUT = int(os.getenv('TIMELINE_INLINE_FAN_OUT', 100))
+TIMELINE_FAN_OUT_LIMIT = int(os.getenv('TIMELINE_FAN_OUT_LIMIT', 10000))
+TIMELINE_BACKFILL = int(os.getenv('TIMELINE_BACKFILL', 100))
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+RECIPE_IMAGE_THUMBNAIL_SIZE = int(os.getenv(
+    'RECIPE_IMAGE_THUMBNAIL_SIZE', 480
+))
+RECIPE_IMAGE_WEBP_QUALITY = int(os.getenv('RECIPE_IMAGE_WEBP_QUALITY', 80))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
@@ -3,8 +3,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics/', metrics),
     path('api/', include('recipes.urls')),
     path('api/', include('users.urls')),
 ]
@@ -0,0 +1,59 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = None
+collected = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='foodgram-background')
+    return executor
+
+
+def shutdown():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=True)
+        executor = None
+
+
+def run_in_worker(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', func.__name__, args)
+    finally:
+        close_old_connections()
+
+
+@contextmanager
+def collect_tasks():
+    global collected
+    collected = []
+    try:
+        yield collected
+    finally:
+        collected = None
+
+
+def run_on_commit(func, *args):
+    if collected is not None:
+        tasks = collected
+        transaction.on_commit(lambda: tasks.append((func, args)))
+        return
+    if settings.BACKGROUND_WORKERS == 0:
+        transaction.on_commit(lambda: func(*args))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_in_worker, func, *args))
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import md5
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+CatalogueEntry = namedtuple(
+    'CatalogueEntry',
+    ('payload', 'etag', 'version', 'last_modified', 'expires'))
+
+
+class CatalogueCache:
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        alias = settings.CATALOGUE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def version_key(self, name):
+        return f'catalogue:{name}:version'
+
+    def get_version(self, name):
+        if self.shared is None:
+            with self.lock:
+                return self.versions.setdefault(name, int(time.time()))
+        version = self.shared.get(self.version_key(name))
+        if version is None:
+            version = int(time.time())
+            if not self.shared.add(self.version_key(name), version, None):
+                version = self.shared.get(self.version_key(name), version)
+        return version
+
+    def invalidate(self, name):
+        version = int(time.time())
+        with self.lock:
+            self.versions[name] = max(version, self.versions.get(name, 0) + 1)
+            version = self.versions[name]
+            self.entries.pop(name, None)
+        if self.shared is not None:
+            self.shared.set(self.version_key(name), version, None)
+
+    def get(self, name, build):
+        version = self.get_version(name)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(name)
+            if (entry is not None and entry.version == version
+                    and entry.expires > now):
+                self.entries.move_to_end(name)
+                return entry
+        payload_key = f'catalogue:{name}:{version}'
+        payload = None
+        if self.shared is not None:
+            payload = self.shared.get(payload_key)
+        if payload is None:
+            payload = build()
+            if self.shared is not None:
+                self.shared.set(payload_key, payload,
+                                settings.CATALOGUE_CACHE_TIMEOUT)
+        etag = quote_etag(md5(payload, usedforsecurity=False).hexdigest())
+        last_modified = version
+        if entry is not None and entry.version == version:
+            last_modified = entry.last_modified
+            if entry.etag != etag:
+                last_modified = max(last_modified, int(time.time()))
+        entry = CatalogueEntry(
+            payload=payload,
+            etag=etag,
+            version=version,
+            last_modified=last_modified,
+            expires=now + settings.CATALOGUE_CACHE_TIMEOUT,
+        )
+        with self.lock:
+            self.entries[name] = entry
+            self.entries.move_to_end(name)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def response(self, request, name, build):
+        entry = self.get(name, build)
+        response = HttpResponse(entry.payload,
+                                content_type='application/json')
+        response['ETag'] = entry.etag
+        response['Last-Modified'] = http_date(entry.last_modified)
+        return get_conditional_response(
+            request, etag=entry.etag, last_modified=entry.last_modified,
+            response=response)
+
+
+class ResponseCache:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def cache(self):
+        alias = settings.RECIPE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def version_key(self):
+        return f'responses:{self.name}:version'
+
+    def get_version(self):
+        version = self.cache.get(self.version_key())
+        if version is None:
+            version = time.time_ns()
+            if not self.cache.add(self.version_key(), version, None):
+                version = self.cache.get(self.version_key(), version)
+        return version
+
+    def invalidate(self):
+        if self.cache is not None:
+            self.cache.set(self.version_key(), time.time_ns(), None)
+
+    def entry_key(self, request, version):
+        params = sorted(request.query_params.lists())
+        fingerprint = md5(
+            repr((request.path, request.accepted_renderer.format,
+                  params)).encode(),
+            usedforsecurity=False).hexdigest()
+        return f'responses:{self.name}:{version}:{fingerprint}'
+
+    def response(self, request, build):
+        if self.cache is None:
+            return build()
+        key = self.entry_key(request, self.get_version())
+        entry = self.cache.get(key)
+        if entry is None:
+            response = build()
+            if response.status_code == 200:
+                self.cache.set(key, (
+                    response.data, response.get('ETag'),
+                    parse_http_date_safe(response.get('Last-Modified', ''))
+                ), settings.RECIPE_CACHE_TIMEOUT)
+            return response
+        data, etag, last_modified = entry
+        if etag is None:
+            return Response(data)
+        not_modified = get_not_modified_response(
+            request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(data), etag, last_modified)
+
+
+catalogue_cache = CatalogueCache()
+recipe_cache = ResponseCache('recipes')
+
+
+def make_etag(*parts):
+    return quote_etag(
+        md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    response = set_validators(HttpResponse(), etag, last_modified)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response)
+    return None if conditional is response else conditional
@@ -0,0 +1,113 @@
+import base64
+import binascii
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_HEADER = ';base64,'
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_WHITESPACE = ' \t\r\n'
+
+
+class IngredientIndexField(ArrayField):
+    def get_placeholder(self, value, compiler, connection):
+        if connection.vendor != 'postgresql':
+            return '%s'
+        return super().get_placeholder(value, compiler, connection)
+
+
+class RecipeImageField(Base64ImageField):
+    ALLOWED_FORMATS = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'GIF': 'gif',
+        'WEBP': 'webp',
+    }
+    default_error_messages = {
+        'too_large': 'Image size must not exceed {max_bytes} bytes.',
+        'too_many_pixels': 'Image must not exceed {max_pixels} pixels.',
+    }
+    variant_fields = {
+        'thumbnail': 'image_thumbnail',
+        'full': 'image_webp',
+    }
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def get_attribute(self, instance):
+        image = super().get_attribute(instance)
+        variant = self.variant or self.context.get('image_variant')
+        field_name = self.variant_fields.get(variant)
+        if image is None or field_name is None:
+            return image
+        return getattr(image.instance, field_name) or image
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            file = data
+        elif isinstance(data, str):
+            file = self.decode(data)
+        else:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        image_format = self.inspect(file)
+        file.name = f'{uuid.uuid4()}.{self.ALLOWED_FORMATS[image_format]}'
+        file.content_type = Image.MIME.get(image_format)
+        return file
+
+    def check_size(self, size):
+        if size > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.RECIPE_IMAGE_MAX_BYTES)
+
+    def decode(self, data):
+        start = data.find(BASE64_HEADER, 0, 256)
+        start = 0 if start == -1 else start + len(BASE64_HEADER)
+        whitespace = sum(data.count(char, start) for char in BASE64_WHITESPACE)
+        end = len(data.rstrip(BASE64_WHITESPACE))
+        padding = data.count('=', max(start, end - 2), end)
+        self.check_size((len(data) - start - whitespace) * 3 // 4 - padding)
+        file = UploadedFile(tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+            dir=settings.FILE_UPLOAD_TEMP_DIR))
+        pending = ''
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = pending + ''.join(
+                    data[offset:offset + BASE64_CHUNK_SIZE].split())
+                usable = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:usable], validate=True))
+                pending = chunk[usable:]
+            if pending:
+                base64.b64decode(pending, validate=True)
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file.size = file.tell()
+        return file
+
+    def inspect(self, file):
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format, (width, height) = image.format, image.size
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+        if image_format not in self.ALLOWED_FORMATS:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+        return image_format
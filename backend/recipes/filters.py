@@ -1,18 +1,44 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
 from django_filters import rest_framework as filters
 from rest_framework.filters import SearchFilter
 
-from .models import Recipe
+from .models import Recipe, Tag
+from .search import annotate_coverage, get_search_query
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, '-pub_date', '-id')
+        return qs
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug', to_field_name='slug',
+        queryset=Tag.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_by_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_by_shopping_cart')
+    search = filters.CharFilter(method='filter_by_search')
+    ingredients = NumberInFilter(method='filter_by_ingredients')
+    max_missing = filters.NumberFilter(method='filter_by_max_missing',
+                                       min_value=0)
+    ordering = RecipeOrderingFilter(
+        fields=('pub_date', 'favorites_count', 'in_carts_count'))
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ingredients', 'max_missing', 'ordering')
 
     def filter_by_favorite(self, queryset, name, value):
         user = self.request.user
@@ -26,6 +52,45 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(recipe_sc__user=user)
         return queryset
 
+    def filter_by_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value))
+        query = get_search_query(value)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+
+    def filter_by_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        max_missing = self.form.cleaned_data.get('max_missing')
+        return annotate_coverage(
+            queryset, [int(pk) for pk in value],
+            None if max_missing is None else int(max_missing))
+
+    def filter_by_max_missing(self, queryset, name, value):
+        return queryset
+
 
 class IngredientSearchFilter(SearchFilter):
     search_param = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if connection.vendor != 'postgresql':
+            return super().filter_queryset(
+                request, queryset, view).order_by('name')[:limit]
+        prefix = Q(name__startswith=term.lower())
+        return queryset.filter(
+            prefix | Q(name__trigram_similar=term)
+        ).annotate(
+            is_prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+            similarity=TrigramSimilarity('name', term),
+        ).order_by('-is_prefix', '-similarity', 'name')[:limit]
@@ -0,0 +1,56 @@
+import io
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .background import run_on_commit
+from .cache import recipe_cache
+from .models import Recipe
+
+VARIANTS_DIR = 'recipes/images/variants'
+
+
+def schedule_image_variants(recipe):
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if not image_name:
+        return
+    if recipe.image_thumbnail or recipe.image_webp:
+        Recipe.objects.filter(pk=recipe_id).update(
+            image_thumbnail=None, image_webp=None, updated_at=timezone.now())
+    run_on_commit(generate_image_variants, recipe_id, image_name)
+
+
+def encode_webp(image):
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=settings.RECIPE_IMAGE_WEBP_QUALITY,
+               method=4)
+    return ContentFile(output.getvalue())
+
+
+def generate_image_variants(recipe_id, image_name):
+    with default_storage.open(image_name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+        full = encode_webp(image)
+        size = settings.RECIPE_IMAGE_THUMBNAIL_SIZE
+        image.thumbnail((size, size))
+        thumbnail = encode_webp(image)
+    stem = PurePosixPath(image_name).stem
+    webp_name = default_storage.save(f'{VARIANTS_DIR}/{stem}.webp', full)
+    thumbnail_name = default_storage.save(
+        f'{VARIANTS_DIR}/{stem}_thumb.webp', thumbnail)
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_webp=webp_name, image_thumbnail=thumbnail_name,
+        updated_at=timezone.now())
+    if not updated:
+        default_storage.delete(webp_name)
+        default_storage.delete(thumbnail_name)
+        return False
+    recipe_cache.invalidate()
+    return True
@@ -0,0 +1,270 @@
+import base64
+import io
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes import background, shopping_list, timeline
+from recipes.counters import reconcile_counters
+from recipes.recommendations import rebuild_neighbours
+from recipes.search import update_ingredient_index, update_search_vector
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeNeighbour, ShoppingCart, Tag, TagRecipe)
+from users.models import Subscribe
+
+User = get_user_model()
+
+QUERY_BUDGETS = {
+    'recipe-list': 6,
+    'recipe-list-anonymous': 6,
+    'recipe-list-cursor': 5,
+    'recipe-list-not-modified': 2,
+    'recipe-retrieve': 5,
+    'recipe-similar': 5,
+    'recipe-recommended': 4,
+    'recipe-feed': 5,
+    'recipe-by-ingredients': 6,
+    'recipe-create': 14,
+    'recipe-create-large': 14,
+    'download-shopping-cart': 1,
+    'shopping-list': 1,
+    'subscriptions': 4,
+    'ingredient-search': 2,
+}
+LARGE_RECIPE_INGREDIENTS = 30
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database and measure query count, latency '
+            'and peak memory of the API endpoints')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=8,
+                            help='Ingredients per recipe')
+        parser.add_argument('--catalogue', type=int, default=2000,
+                            help='Ingredients in the catalogue')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--max-p95-ms', type=float, default=None,
+                            help='Fail when any endpoint p95 exceeds this')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['ingredients'] > options['catalogue']:
+            raise CommandError('--ingredients cannot exceed --catalogue')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root), \
+                    background.collect_tasks() as tasks:
+                self.seed(options)
+                results = self.run_scenarios(options, tasks)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.report(results, options['max_p95_ms'])
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        self.users = User.objects.bulk_create(
+            User(username=f'bench{index}', email=f'bench{index}@example.com',
+                 first_name='Bench', last_name=str(index),
+                 password='!unusable')
+            for index in range(options['users'])
+        )
+        self.tags = Tag.objects.bulk_create(
+            Tag(name=f'tag{index}', color=f'#0000{index:02d}',
+                slug=f'tag{index}')
+            for index in range(3)
+        )
+        self.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {index}', measurement_unit='г')
+            for index in range(options['catalogue'])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=rng.choice(self.users), name=f'recipe {index}',
+                   text='benchmark recipe', cooking_time=10,
+                   image='recipes/images/benchmark.png')
+            for index in range(options['recipes'])
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=rng.randint(1, 500)).normalize()
+            for recipe in recipes
+            for ingredient in rng.sample(self.ingredients,
+                                         options['ingredients'])
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(self.tags, 2)
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in self.users
+                for recipe in rng.sample(recipes, min(10, len(recipes)))
+            )
+        Subscribe.objects.bulk_create(
+            Subscribe(user=user, author=author)
+            for user in self.users
+            for author in rng.sample(self.users, min(5, len(self.users)))
+            if author != user
+        )
+        for subscription in Subscribe.objects.all():
+            timeline.backfill(subscription.user_id, subscription.author_id)
+        update_search_vector(Recipe.objects.all())
+        update_ingredient_index(Recipe.objects.all())
+        reconcile_counters()
+        shopping_list.rebuild()
+        rebuild_neighbours()
+        self.users = list(User.objects.filter(
+            pk__in=[user.pk for user in self.users]).order_by('pk'))
+        self.recipes = recipes
+        self.probe_id = RecipeNeighbour.objects.order_by(
+            'recipe_id').values_list('recipe_id', flat=True).first()
+        if self.probe_id is None:
+            self.probe_id = recipes[0].id
+        self.rng = rng
+
+    def get_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'white').save(buffer, 'PNG')
+        return ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
+
+    def get_scenarios(self, options):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        anonymous = APIClient()
+        page = f"limit={options['page_size']}"
+        image = self.get_image()
+        pantry = ','.join(map(str, RecipeIngredient.objects.filter(
+            recipe__in=self.recipes[:3]).values_list('ingredient_id',
+                                                     flat=True)))
+
+        def create(count):
+            return client.post('/api/recipes/', {
+                'tags': [tag.id for tag in self.tags[:2]],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 10}
+                    for ingredient in self.ingredients[:count]
+                ],
+                'image': image,
+                'name': 'benchmark',
+                'text': 'benchmark recipe',
+                'cooking_time': 10,
+            }, format='json')
+
+        def not_modified(url):
+            etag = client.get(url)['ETag']
+            return lambda: client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        def download():
+            response = client.get('/api/recipes/download_shopping_cart/')
+            b''.join(response.streaming_content)
+            return response
+
+        return {
+            'recipe-list': lambda: client.get(f'/api/recipes/?{page}'),
+            'recipe-list-anonymous': lambda: anonymous.get(
+                f'/api/recipes/?{page}'),
+            'recipe-list-cursor': lambda: client.get(
+                f'/api/recipes/?paginate=cursor&{page}'),
+            'recipe-list-not-modified': not_modified(
+                f'/api/recipes/?{page}'),
+            'recipe-retrieve': lambda: client.get(
+                f'/api/recipes/{self.probe_id}/'),
+            'recipe-similar': lambda: client.get(
+                f'/api/recipes/{self.probe_id}/similar/'),
+            'recipe-recommended': lambda: client.get(
+                '/api/recipes/recommended/'),
+            'recipe-feed': lambda: client.get(f'/api/recipes/feed/?{page}'),
+            'recipe-by-ingredients': lambda: client.get(
+                f'/api/recipes/?ingredients={pantry}&max_missing=3&{page}'),
+            'recipe-create': lambda: create(options['ingredients']),
+            'recipe-create-large': lambda: create(min(
+                options['catalogue'],
+                max(options['ingredients'], LARGE_RECIPE_INGREDIENTS))),
+            'download-shopping-cart': download,
+            'shopping-list': lambda: client.get(
+                '/api/recipes/shopping_list/'),
+            'subscriptions': lambda: client.get(
+                f'/api/users/subscriptions/?recipes_limit=3&{page}'),
+            'ingredient-search': lambda: client.get(
+                '/api/ingredients/?name=ingredient 1'),
+        }
+
+    def run_scenarios(self, options, tasks):
+        results = []
+        for name, request in self.get_scenarios(options).items():
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+            query_count = len(queries)
+            self.run_tasks(tasks)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{name} returned {response.status_code}')
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+                self.run_tasks(tasks)
+            tracemalloc.start()
+            request()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.run_tasks(tasks)
+            timings.sort()
+            results.append({
+                'name': name,
+                'queries': query_count,
+                'budget': QUERY_BUDGETS[name],
+                'p50': timings[len(timings) // 2],
+                'p95': timings[min(len(timings) - 1,
+                                   int(len(timings) * 0.95))],
+                'peak': peak / 1024,
+            })
+        return results
+
+    def run_tasks(self, tasks):
+        while tasks:
+            func, args = tasks.pop(0)
+            func(*args)
+
+    def report(self, results, max_p95_ms):
+        self.stdout.write(
+            f"{'endpoint':<24}{'queries':>9}{'budget':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>11}")
+        failures = []
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<24}{result['queries']:>9}"
+                f"{result['budget']:>8}{result['p50']:>10.2f}"
+                f"{result['p95']:>10.2f}{result['peak']:>11.1f}")
+            if result['queries'] > result['budget']:
+                failures.append(
+                    f"{result['name']}: {result['queries']} queries, "
+                    f"budget {result['budget']}")
+            if max_p95_ms is not None and result['p95'] > max_p95_ms:
+                failures.append(
+                    f"{result['name']}: p95 {result['p95']:.2f} ms, "
+                    f"budget {max_p95_ms} ms")
+        if failures:
+            raise CommandError('Budget exceeded:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All budgets met'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import rebuild_neighbours
+
+
+class Command(BaseCommand):
+    help = ('Precompute top-K similar recipes from favorites and shopping '
+            'carts co-occurrence')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None,
+                            help='Neighbours stored per recipe')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Recipes per similarity block')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_neighbours(options['top_k'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {count} recipe neighbours in '
+            f'{time.perf_counter() - started:.1f}s'))
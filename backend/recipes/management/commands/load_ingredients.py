@@ -0,0 +1,105 @@
+import csv
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.cache import catalogue_cache
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Load ingredients from CSV or JSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            default=[settings.BASE_DIR / 'ingredients.json'],
+            help='CSV (name,measurement_unit) or JSON files to load')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per bulk_create batch')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Do not use the PostgreSQL COPY fast path')
+
+    def handle(self, *args, paths, batch_size, no_copy, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        rows = self.unique_rows(self.read_rows(Path(path)) for path in paths)
+        if connection.vendor == 'postgresql' and not no_copy:
+            total = self.copy_rows(rows)
+        else:
+            total = self.bulk_create_rows(rows, batch_size)
+        created = Ingredient.objects.count() - before
+        if created:
+            catalogue_cache.invalidate(Ingredient._meta.label_lower)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {total} unique rows, created {created} ingredients '
+            f'in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.0f} rows/sec)'
+        ))
+
+    def read_rows(self, path):
+        if not path.exists():
+            raise CommandError(f'File {path} does not exist')
+        with path.open(encoding='utf-8') as file:
+            if path.suffix == '.json':
+                for item in json.load(file):
+                    item = item.get('fields', item)
+                    yield item['name'], item['measurement_unit']
+            else:
+                for row in csv.reader(file):
+                    if len(row) != 2:
+                        raise CommandError(f'Malformed row in {path}: {row}')
+                    yield row[0], row[1]
+
+    def unique_rows(self, sources):
+        seen = set()
+        for rows in sources:
+            for name, measurement_unit in rows:
+                key = (name.strip(), measurement_unit.strip())
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def bulk_create_rows(self, rows, batch_size):
+        total, batch = 0, []
+        for name, measurement_unit in rows:
+            batch.append(
+                Ingredient(name=name, measurement_unit=measurement_unit))
+            if len(batch) == batch_size:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return total + len(batch)
+
+    def copy_rows(self, rows):
+        table = Ingredient._meta.db_table
+        total = 0
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as buffer:
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(row)
+                total += 1
+            buffer.seek(0)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'CREATE TEMPORARY TABLE ingredient_import '
+                    '(name varchar(128), measurement_unit varchar(16)) '
+                    'ON COMMIT DROP')
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer)
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'SELECT name, measurement_unit FROM ingredient_import '
+                    'ON CONFLICT (name, measurement_unit) DO NOTHING')
+        return total
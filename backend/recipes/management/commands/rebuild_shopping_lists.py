@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized shopping lists from shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='users', help='Only rebuild these users')
+
+    def handle(self, *args, **options):
+        items = rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt shopping lists with {items} items'))
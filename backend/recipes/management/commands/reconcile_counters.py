@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized favorites, cart and subscription counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled counters of {recipes} recipes and {users} users'))
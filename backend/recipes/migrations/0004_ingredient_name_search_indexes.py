@@ -0,0 +1,37 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+INDEXES = (
+    GinIndex(fields=('name',), name='ingredient_name_trgm',
+             opclasses=('gin_trgm_ops',)),
+    models.Index(fields=('name',), name='ingredient_name_prefix',
+                 opclasses=('varchar_pattern_ops',)),
+)
+
+
+def add_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    for index in INDEXES:
+        schema_editor.add_index(Ingredient, index)
+
+
+def remove_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    for index in INDEXES:
+        schema_editor.remove_index(Ingredient, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_name_indexes, remove_name_indexes),
+    ]
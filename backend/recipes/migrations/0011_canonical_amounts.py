@@ -0,0 +1,94 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+PRECISION = Decimal('0.001')
+BASE_UNITS = {'mass': 'г', 'volume': 'мл'}
+UNITS = {
+    'мг': ('mass', Decimal('0.001')),
+    'г': ('mass', Decimal(1)),
+    'кг': ('mass', Decimal(1000)),
+    'мл': ('volume', Decimal(1)),
+    'л': ('volume', Decimal(1000)),
+    'капля': ('volume', Decimal('0.05')),
+    'ч. л.': ('volume', Decimal(5)),
+    'ст. л.': ('volume', Decimal(15)),
+    'стакан': ('volume', Decimal(250)),
+}
+ALIASES = {
+    'гр': 'г',
+    'грамм': 'г',
+    'килограмм': 'кг',
+    'миллилитр': 'мл',
+    'литр': 'л',
+    'ч.л.': 'ч. л.',
+    'чайная ложка': 'ч. л.',
+    'ст.л.': 'ст. л.',
+    'столовая ложка': 'ст. л.',
+}
+
+
+def normalize_unit(unit):
+    unit = ' '.join(unit.lower().split())
+    for candidate in (unit, unit.rstrip('.')):
+        candidate = ALIASES.get(candidate, candidate)
+        if candidate in UNITS:
+            return candidate
+    return unit
+
+
+def canonicalize(amount, unit, density=None):
+    unit = normalize_unit(unit)
+    amount = Decimal(amount)
+    if unit not in UNITS:
+        return amount.quantize(PRECISION, ROUND_HALF_UP), unit
+    dimension, factor = UNITS[unit]
+    amount *= factor
+    if dimension == 'volume' and density:
+        amount *= Decimal(density)
+        dimension = 'mass'
+    return amount.quantize(PRECISION, ROUND_HALF_UP), BASE_UNITS[dimension]
+
+
+def fill_canonical_amounts(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    batch = []
+    rows = RecipeIngredient.objects.select_related('ingredient').iterator(
+        chunk_size=2000)
+    for row in rows:
+        row.canonical_amount, row.canonical_unit = canonicalize(
+            row.amount, row.ingredient.measurement_unit,
+            row.ingredient.density)
+        batch.append(row)
+        if len(batch) == 2000:
+            RecipeIngredient.objects.bulk_update(
+                batch, ('canonical_amount', 'canonical_unit'))
+            batch = []
+    RecipeIngredient.objects.bulk_update(
+        batch, ('canonical_amount', 'canonical_unit'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='density',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, verbose_name='Density, g/ml'),
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='canonical_amount',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=14, verbose_name='Amount in canonical unit'),
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='canonical_unit',
+            field=models.CharField(blank=True, editable=False, max_length=16, verbose_name='Canonical unit'),
+        ),
+        migrations.RunPython(fill_canonical_amounts, migrations.RunPython.noop),
+    ]
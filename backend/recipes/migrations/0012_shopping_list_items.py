@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Sum
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    rows = ShoppingCart.objects.values(
+        'user', name=F('recipe__recipes_ingredients__ingredient__name'),
+        measurement_unit=F('recipe__recipes_ingredients__canonical_unit')
+    ).annotate(
+        amount=Sum('recipe__recipes_ingredients__canonical_amount')
+    ).filter(name__isnull=False).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=row['user'], name=row['name'],
+                          measurement_unit=row['measurement_unit'],
+                          amount=row['amount'])
+         for row in rows.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0011_canonical_amounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, verbose_name='Ingredient title')),
+                ('measurement_unit', models.CharField(max_length=16, verbose_name='Measurement unit')),
+                ('amount', models.DecimalField(decimal_places=3, max_digits=14, verbose_name='Amount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Shopping list item',
+                'verbose_name_plural': 'Shopping list',
+                'ordering': ('name', 'measurement_unit'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'name', 'measurement_unit'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:01
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import recipes.fields
+
+INGREDIENT_INDEX = GinIndex(fields=('ingredient_ids',),
+                            name='recipe_ingredient_ids_idx')
+
+
+def add_ingredient_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    Recipe.objects.update(ingredient_ids=Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            ids=ArrayAgg('ingredient_id', distinct=True,
+                         ordering='ingredient_id')
+        ).values('ids')))
+    schema_editor.add_index(Recipe, INGREDIENT_INDEX)
+
+
+def remove_ingredient_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    schema_editor.remove_index(Recipe, INGREDIENT_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_timeline_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=recipes.fields.IngredientIndexField(base_field=models.IntegerField(), editable=False, null=True, size=None, verbose_name='Ingredient index'),
+        ),
+        migrations.RunPython(add_ingredient_index, remove_ingredient_index),
+    ]
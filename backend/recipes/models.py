@@ -1,6 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from colorfield.fields import ColorField
+
+from .fields import IngredientIndexField
+from .units import canonicalize
+
 User = get_user_model()
 
 
@@ -9,10 +14,18 @@ class Ingredient(models.Model):
                             verbose_name='Ingredient title')
     measurement_unit = models.CharField(
         max_length=16, verbose_name='Measurement unit')
+    density = models.DecimalField(
+        max_digits=8, decimal_places=3, null=True, blank=True,
+        verbose_name='Density, g/ml')
 
     class Meta:
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_unit'),
+        )
 
     def __str__(self):
         return self.name
@@ -46,6 +59,20 @@ class Recipe(models.Model):
         blank=False,
         verbose_name='Recipe image'
     )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/images/variants/',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Recipe image thumbnail'
+    )
+    image_webp = models.ImageField(
+        upload_to='recipes/images/variants/',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Recipe image in WebP'
+    )
     text = models.TextField(
         blank=False, verbose_name='Description')
     ingredients = models.ManyToManyField(
@@ -56,9 +83,24 @@ class Recipe(models.Model):
         blank=False, verbose_name='Cooking Time')
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Publication Date')
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name='Last modified')
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Favorites count')
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Shopping carts count')
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name='Search vector')
+    ingredient_ids = IngredientIndexField(
+        models.IntegerField(), null=True, editable=False,
+        verbose_name='Ingredient index')
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+        )
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -85,6 +127,10 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = 'Favorite recipe'
         verbose_name_plural = 'Favorites'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_favorite'),
+        )
 
 
 class ShoppingCart(models.Model):
@@ -98,6 +144,85 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Shopping cart'
         verbose_name_plural = 'Shopping cart'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_shopping_cart'),
+        )
+
+
+class RecipeNeighbour(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='neighbours', verbose_name='Recipe')
+    neighbour = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='neighbour_of', verbose_name='Similar recipe')
+    score = models.FloatField(verbose_name='Similarity')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Recipe neighbour'
+        verbose_name_plural = 'Recipe neighbours'
+        constraints = (
+            models.UniqueConstraint(fields=('recipe', 'neighbour'),
+                                    name='unique_recipe_neighbour'),
+        )
+        indexes = (
+            models.Index(fields=('recipe', '-score'),
+                         name='recipe_neighbour_score_idx'),
+        )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='timeline', verbose_name='Follower')
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='+', verbose_name='Recipe author')
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='timeline_entries', verbose_name='Recipe')
+    pub_date = models.DateTimeField(verbose_name='Publication Date')
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        verbose_name = 'Timeline entry'
+        verbose_name_plural = 'Timeline'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-id'),
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=('author', 'user', '-pub_date'),
+                         name='timeline_author_pub_date_idx'),
+        )
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='shopping_list', verbose_name='User')
+    name = models.CharField(max_length=128, verbose_name='Ingredient title')
+    measurement_unit = models.CharField(
+        max_length=16, verbose_name='Measurement unit')
+    amount = models.DecimalField(
+        max_digits=14, decimal_places=3, verbose_name='Amount')
+
+    class Meta:
+        ordering = ('name', 'measurement_unit')
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'name', 'measurement_unit'),
+                name='unique_shopping_list_item'),
+        )
+
+    def __str__(self):
+        return f'{self.name}: {self.amount} {self.measurement_unit}'
 
 
 class RecipeIngredient(models.Model):
@@ -106,3 +231,19 @@ class RecipeIngredient(models.Model):
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
                                    related_name='used_in_recipes')
     amount = models.PositiveSmallIntegerField(default=0)
+    canonical_amount = models.DecimalField(
+        max_digits=14, decimal_places=3, default=0, editable=False,
+        verbose_name='Amount in canonical unit')
+    canonical_unit = models.CharField(
+        max_length=16, blank=True, editable=False,
+        verbose_name='Canonical unit')
+
+    def normalize(self):
+        self.canonical_amount, self.canonical_unit = canonicalize(
+            self.amount, self.ingredient.measurement_unit,
+            self.ingredient.density)
+        return self
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
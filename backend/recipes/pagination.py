@@ -1,7 +1,12 @@
-from users.pagination import CustomPageNumberPagination
+from users.pagination import CustomPageNumberPagination, HybridPagination
 from rest_framework.response import Response
 
 
+class RecipePagination(HybridPagination):
+    cursor_ordering = ('-pub_date', '-id')
+    cursor_unsupported_params = ('ordering', 'search', 'ingredients')
+
+
 class CustomDataPagination(CustomPageNumberPagination):
     def get_paginated_response(self, data):
         return Response(data)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from rest_framework import exceptions, parsers, status
+
+BODY_HEADROOM = 64 * 1024
+
+
+class RequestTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body is too large.'
+    default_code = 'request_too_large'
+
+
+class ContentLengthMixin:
+    def get_max_length(self):
+        return settings.RECIPE_IMAGE_MAX_BYTES + BODY_HEADROOM
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        if request is not None:
+            try:
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                raise exceptions.ParseError('Invalid Content-Length.')
+            if length > self.get_max_length():
+                raise RequestTooLarge()
+        return super().parse(stream, media_type, parser_context)
+
+
+class RecipeJSONParser(ContentLengthMixin, parsers.JSONParser):
+    def get_max_length(self):
+        return settings.RECIPE_IMAGE_MAX_BYTES * 4 // 3 + BODY_HEADROOM
+
+
+class RecipeMultiPartParser(ContentLengthMixin, parsers.MultiPartParser):
+    pass
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import Favorite, RecipeNeighbour, ShoppingCart
+
+
+def get_interactions():
+    import numpy as np
+
+    pairs = []
+    for model in (Favorite, ShoppingCart):
+        rows = model.objects.values_list('user_id', 'recipe_id')
+        pairs.append(np.fromiter(
+            (value for row in rows.iterator(chunk_size=10000)
+             for value in row),
+            dtype=np.int64).reshape(-1, 2))
+    return np.concatenate(pairs)
+
+
+def compute_neighbours(top_k, batch_size=1000):
+    import numpy as np
+    from scipy import sparse
+
+    interactions = get_interactions()
+    if not len(interactions):
+        return
+    users, user_index = np.unique(interactions[:, 0], return_inverse=True)
+    recipes, recipe_index = np.unique(
+        interactions[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(interactions), dtype=np.float32),
+         (user_index, recipe_index)),
+        shape=(len(users), len(recipes)))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    matrix = (matrix @ sparse.diags(1 / norms)).tocsc()
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(recipes), batch_size):
+        stop = min(start + batch_size, len(recipes))
+        similarity = (transposed[start:stop] @ matrix).tocsr()
+        for row in range(similarity.shape[0]):
+            begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+            columns = similarity.indices[begin:end]
+            other = columns != start + row
+            scores, columns = similarity.data[begin:end][other], columns[other]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                scores, columns = scores[best], columns[best]
+            for score, column in zip(scores, columns):
+                yield (int(recipes[start + row]), int(recipes[column]),
+                       float(score))
+
+
+def rebuild_neighbours(top_k=None, batch_size=1000, insert_batch=5000):
+    top_k = top_k or settings.RECIPE_NEIGHBOURS
+    count, batch = 0, []
+    with transaction.atomic():
+        RecipeNeighbour.objects.all().delete()
+        for recipe_id, neighbour_id, score in compute_neighbours(
+                top_k, batch_size):
+            batch.append(RecipeNeighbour(
+                recipe_id=recipe_id, neighbour_id=neighbour_id, score=score))
+            if len(batch) == insert_batch:
+                count += len(RecipeNeighbour.objects.bulk_create(batch))
+                batch = []
+        count += len(RecipeNeighbour.objects.bulk_create(batch))
+    return count
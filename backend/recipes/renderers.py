@@ -0,0 +1,97 @@
+import csv
+import tempfile
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from .units import humanize
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset or 'utf-8')
+
+    def stream(self, items):
+        raise NotImplementedError
+
+    def format_item(self, item):
+        amount, unit = humanize(item['amount'], item['measurement_unit'])
+        return item['name'], amount, unit
+
+
+class PlainTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        for item in items:
+            name, amount, unit = self.format_item(item)
+            yield f'{name}: {amount} {unit}\n'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for item in items:
+            yield writer.writerow(self.format_item(item))
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    chunk_size = 64 * 1024
+    font_name = 'ShoppingListFont'
+
+    def get_font(self):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        try:
+            pdfmetrics.getFont(self.font_name)
+        except KeyError:
+            try:
+                pdfmetrics.registerFont(
+                    TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT))
+            except OSError:
+                return 'Helvetica'
+        return self.font_name
+
+    def stream(self, items):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        font = self.get_font()
+        width, height = A4
+        margin, line_height = 50, 18
+        with tempfile.SpooledTemporaryFile(
+                max_size=self.chunk_size) as output:
+            pdf = canvas.Canvas(output, pagesize=A4)
+            pdf.setFont(font, 12)
+            y = height - margin
+            for item in items:
+                if y < margin:
+                    pdf.showPage()
+                    pdf.setFont(font, 12)
+                    y = height - margin
+                name, amount, unit = self.format_item(item)
+                pdf.drawString(margin, y, f'{name}: {amount} {unit}')
+                y -= line_height
+            pdf.save()
+            output.seek(0)
+            while chunk := output.read(self.chunk_size):
+                yield chunk
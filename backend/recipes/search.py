@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection
+from django.db.models import (Count, F, FloatField, Func, IntegerField,
+                              OuterRef, Q, Subquery, Value)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import RecipeIngredient
+
+
+def get_search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (SearchVector('name', weight='A', config=config)
+            + SearchVector('text', weight='B', config=config))
+
+
+def get_search_query(value):
+    return SearchQuery(value, config=settings.RECIPE_SEARCH_CONFIG,
+                       search_type='websearch')
+
+
+def update_search_vector(queryset):
+    if connection.vendor == 'postgresql':
+        queryset.update(search_vector=get_search_vector())
+
+
+def get_ingredient_index(ingredient_ids):
+    if connection.vendor == 'postgresql':
+        return sorted(set(ingredient_ids))
+    return None
+
+
+def update_ingredient_index(queryset):
+    if connection.vendor == 'postgresql':
+        queryset.update(ingredient_ids=Subquery(
+            RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                ids=ArrayAgg('ingredient_id', distinct=True,
+                             ordering='ingredient_id')
+            ).values('ids')))
+
+
+def remove_from_ingredient_index(queryset, ingredient_id):
+    if connection.vendor == 'postgresql':
+        queryset.filter(ingredient_ids__contains=[ingredient_id]).update(
+            ingredient_ids=Func(F('ingredient_ids'), Value(ingredient_id),
+                                function='array_remove'))
+
+
+def annotate_coverage(queryset, ingredient_ids, max_missing=None):
+    ingredient_ids = sorted(set(ingredient_ids))
+    if connection.vendor == 'postgresql':
+        column = f'"{queryset.model._meta.db_table}"."ingredient_ids"'
+        queryset = queryset.filter(ingredient_ids__overlap=ingredient_ids)
+        if max_missing == 0:
+            queryset = queryset.filter(
+                ingredient_ids__contained_by=ingredient_ids)
+        queryset = queryset.annotate(
+            ingredients_total=Func(F('ingredient_ids'), function='cardinality',
+                                   output_field=IntegerField()),
+            ingredients_matched=RawSQL(
+                f'cardinality(ARRAY(SELECT unnest({column}) '
+                'INTERSECT SELECT unnest(%s::integer[])))',
+                (ingredient_ids,), output_field=IntegerField()),
+        )
+    else:
+        queryset = queryset.annotate(
+            ingredients_total=Count('recipes_ingredients', distinct=True),
+            ingredients_matched=Count(
+                'recipes_ingredients', distinct=True,
+                filter=Q(
+                    recipes_ingredients__ingredient_id__in=ingredient_ids)),
+        ).filter(ingredients_matched__gt=0)
+    queryset = queryset.annotate(
+        ingredients_missing=F('ingredients_total') - F('ingredients_matched'),
+        coverage=(Cast('ingredients_matched', FloatField())
+                  / F('ingredients_total')),
+    )
+    if max_missing is not None:
+        queryset = queryset.filter(ingredients_missing__lte=max_missing)
+    return queryset.order_by(
+        '-coverage', 'ingredients_missing', '-pub_date', '-id')
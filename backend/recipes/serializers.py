@@ -1,9 +1,19 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from drf_extra_fields.fields import Base64ImageField
+from rest_framework.utils import html
 
+from . import timeline
+from .fields import RecipeImageField
 from .models import (Favorite, Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Tag)
+                     RecipeIngredient, ShoppingCart, ShoppingListItem, Tag,
+                     TagRecipe)
+from .search import get_ingredient_index
+from .shopping_list import (apply_difference, get_cart_users,
+                            get_difference, get_recipe_totals)
 
 User = get_user_model()
 
@@ -13,6 +23,8 @@ def get_is_authenticated(request):
 
 
 def get_is_favorited(obj, serializer_field):
+    if hasattr(obj, 'is_favorited'):
+        return obj.is_favorited
     request = serializer_field.context.get('request')
     if get_is_authenticated(request):
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
@@ -20,6 +32,8 @@ def get_is_favorited(obj, serializer_field):
 
 
 def get_is_in_shopping_cart(obj, serializer_field):
+    if hasattr(obj, 'is_in_shopping_cart'):
+        return obj.is_in_shopping_cart
     request = serializer_field.context.get('request')
     if get_is_authenticated(request):
         return ShoppingCart.objects.filter(
@@ -27,6 +41,31 @@ def get_is_in_shopping_cart(obj, serializer_field):
     return False
 
 
+def get_recipe_prefetches():
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch('recipes_ingredients',
+                 queryset=RecipeIngredient.objects.select_related(
+                     'ingredient')),
+    )
+
+
+def get_objects_in_bulk(model, ids, field_name):
+    objects = model.objects.in_bulk(ids)
+    missing = [pk for pk in ids if pk not in objects]
+    if missing:
+        raise serializers.ValidationError({field_name: [
+            f'Invalid pk "{pk}" - object does not exist.' for pk in missing
+        ]})
+    return [objects[pk] for pk in ids]
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=100)
+
+
 class Hex2NameColor(serializers.Field):
 
     def to_representation(self, value):
@@ -34,7 +73,7 @@ class Hex2NameColor(serializers.Field):
 
 
 class RecipeShortInfoSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RecipeImageField(variant='thumbnail')
     cooking_time = serializers.IntegerField(required=True, min_value=1)
 
     class Meta:
@@ -59,8 +98,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                            source='ingredient',)
+    id = serializers.IntegerField(source='ingredient_id', min_value=1)
     name = serializers.CharField(source='ingredient.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredient.measurement_unit', read_only=True)
@@ -71,12 +109,18 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class TagListField(serializers.ListField):
+    child = serializers.IntegerField(min_value=1)
+
+    def to_representation(self, value):
+        return TagSerializer(value.all(), many=True).data
+
+
 class RecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = TagListField()
     ingredients = RecipeIngredientSerializer(many=True,
                                              source='recipes_ingredients')
-    image = Base64ImageField(required=True, allow_null=False)
+    image = RecipeImageField(required=True, allow_null=False)
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     is_favorited = serializers.SerializerMethodField('get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -90,32 +134,102 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'text', 'cooking_time',)
         read_only_field = ('pub_date')
 
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    def parse_multipart(self, data):
+        parsed = {key: data.get(key) for key in data}
+        if 'tags' in data:
+            parsed['tags'] = data.getlist('tags')
+        if isinstance(parsed.get('ingredients'), str):
+            try:
+                parsed['ingredients'] = json.loads(parsed['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': ['Ingredients must be a JSON list.']})
+        return parsed
+
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipes_ingredients')
-        new_recipe = Recipe.objects.create(**validated_data)
-        new_recipe.tags.set(tags)
-        self.get_ingredients(new_recipe, ingredients_data)
+        with transaction.atomic(savepoint=False):
+            new_recipe = Recipe.objects.create(
+                **validated_data, ingredient_ids=get_ingredient_index(
+                    item['ingredient'].id for item in ingredients_data))
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=new_recipe, tag=tag) for tag in tags)
+            self.get_ingredients(new_recipe, ingredients_data)
+            timeline.publish(new_recipe)
+        new_recipe.is_favorited = new_recipe.is_in_shopping_cart = False
         return new_recipe
 
     def update(self, instance, validated_data):
-        if 'tags' not in validated_data:
-            raise serializers.ValidationError('Tags field is required')
-        if 'recipes_ingredients' not in validated_data:
-            raise serializers.ValidationError('Ingredient field is required')
-        tags_data = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('recipes_ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients_data = validated_data.pop('recipes_ingredients', None)
         validated_data.pop('author', None)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        instance.tags.set(tags_data)
-        self.get_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
+        with transaction.atomic(savepoint=False):
+            if tags is not None:
+                self.update_tags(instance, tags)
+            if ingredients_data is not None:
+                cart_users = get_cart_users(instance.pk)
+                if cart_users:
+                    previous = get_recipe_totals([instance.pk])
+                self.update_ingredients(instance, ingredients_data)
+                validated_data['ingredient_ids'] = get_ingredient_index(
+                    item['ingredient'].id for item in ingredients_data)
+                if cart_users:
+                    apply_difference(cart_users, get_difference(
+                        get_recipe_totals([instance.pk]), previous))
+            return super().update(instance, validated_data)
+
+    def update_tags(self, recipe, tags):
+        current = set(recipe.tags.values_list('id', flat=True))
+        incoming = {tag.id for tag in tags}
+        if current - incoming:
+            recipe.tags.remove(*(current - incoming))
+        if incoming - current:
+            recipe.tags.add(*(incoming - current))
+
+    def update_ingredients(self, recipe, ingredients_data):
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipes_ingredients.all()
+        }
+        created, updated = [], []
+        for ingredient_data in ingredients_data:
+            ingredient = ingredient_data['ingredient']
+            amount = ingredient_data['amount']
+            recipe_ingredient = existing.pop(ingredient.id, None)
+            if recipe_ingredient is None:
+                created.append(RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=amount).normalize())
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.ingredient = ingredient
+                recipe_ingredient.amount = amount
+                updated.append(recipe_ingredient.normalize())
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in existing.values()]).delete()
+        if updated:
+            RecipeIngredient.objects.bulk_update(
+                updated, ('amount', 'canonical_amount', 'canonical_unit'))
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
 
     def to_representation(self, instance):
         from users.serializers import CustomUserSerializer
+        if 'recipes_ingredients' not in getattr(
+                instance, '_prefetched_objects_cache', {}):
+            prefetch_related_objects([instance], *get_recipe_prefetches())
         representation = super().to_representation(instance)
-        representation['tags'] = TagSerializer(instance.tags, many=True).data
-        representation['author'] = CustomUserSerializer(instance.author).data
+        author = instance.author
+        if hasattr(instance, 'author_is_subscribed'):
+            author.is_subscribed = instance.author_is_subscribed
+        representation['author'] = CustomUserSerializer(
+            author, context=self.context).data
         return representation
 
     def validate_image(self, value):
@@ -131,17 +245,31 @@ class RecipeSerializer(serializers.ModelSerializer):
                 "Tags field cannot contain duplicate values.")
         return value
 
+    def validate(self, attrs):
+        if 'tags' in attrs:
+            attrs['tags'] = get_objects_in_bulk(Tag, attrs['tags'], 'tags')
+        if 'recipes_ingredients' in attrs:
+            ingredients = get_objects_in_bulk(
+                Ingredient,
+                [item.pop('ingredient_id')
+                 for item in attrs['recipes_ingredients']],
+                'ingredients')
+            for item, ingredient in zip(attrs['recipes_ingredients'],
+                                        ingredients):
+                item['ingredient'] = ingredient
+        return attrs
+
     def validate_ingredients(self, ingredients_data):
         if not ingredients_data:
             raise serializers.ValidationError(
                 "Ingredients field cannot be empty.")
         ingredient_list = []
         for ingredient_data in ingredients_data:
-            if (not ingredient_data.get('ingredient')
+            if (not ingredient_data.get('ingredient_id')
                     or not ingredient_data.get('amount')):
                 raise serializers.ValidationError(
                     "Ingredient should have an ingredient and amount field")
-            ingredient = ingredient_data.get('ingredient')
+            ingredient = ingredient_data.get('ingredient_id')
             ingredient_list.append(ingredient)
         if len(ingredient_list) != len(set(ingredient_list)):
             raise serializers.ValidationError()
@@ -153,7 +281,7 @@ class RecipeSerializer(serializers.ModelSerializer):
                 recipe=recipe,
                 ingredient=ingredient_data['ingredient'],
                 amount=ingredient_data['amount']
-            )
+            ).normalize()
             for ingredient_data in ingredients_data
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
@@ -169,7 +297,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 class FavoriteSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = Base64ImageField(source='recipe.image')
+    image = RecipeImageField(source='recipe.image', variant='thumbnail')
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
@@ -183,7 +311,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
 class ShoppingCartSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = Base64ImageField(source='recipe.image')
+    image = RecipeImageField(source='recipe.image', variant='thumbnail')
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
@@ -192,3 +320,12 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         return get_is_in_shopping_cart(obj.recipe, self)
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    amount = serializers.DecimalField(
+        max_digits=14, decimal_places=3, coerce_to_string=False)
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('name', 'amount', 'measurement_unit')
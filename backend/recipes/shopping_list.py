@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+
+def lock_users(user_ids):
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def get_cart_users(recipe_id):
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def get_recipe_totals(recipe_ids):
+    rows = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values(
+        name=F('ingredient__name'), measurement_unit=F('canonical_unit')
+    ).annotate(amount=Sum('canonical_amount')).order_by()
+    return {(row['name'], row['measurement_unit']): row['amount']
+            for row in rows}
+
+
+def get_difference(totals, previous):
+    difference = dict(totals)
+    for key, amount in previous.items():
+        difference[key] = difference.get(key, 0) - amount
+    return difference
+
+
+def apply_difference(user_ids, difference):
+    difference = {key: amount for key, amount in difference.items()
+                  if amount}
+    user_ids = list(user_ids)
+    if not user_ids or not difference:
+        return
+    with transaction.atomic(savepoint=False):
+        lock_users(user_ids)
+        items = {
+            (item.user_id, item.name, item.measurement_unit): item
+            for item in ShoppingListItem.objects.filter(
+                user_id__in=user_ids,
+                name__in={name for name, _ in difference})
+        }
+        created, updated, removed = [], [], []
+        for user_id in user_ids:
+            for (name, unit), amount in difference.items():
+                item = items.get((user_id, name, unit))
+                if item is None:
+                    if amount > 0:
+                        created.append(ShoppingListItem(
+                            user_id=user_id, name=name,
+                            measurement_unit=unit, amount=amount))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    updated.append(item)
+                else:
+                    removed.append(item.pk)
+        if removed:
+            ShoppingListItem.objects.filter(pk__in=removed).delete()
+        if updated:
+            ShoppingListItem.objects.bulk_update(updated, ('amount',))
+        if created:
+            ShoppingListItem.objects.bulk_create(created)
+
+
+def add_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        apply_difference([user_id], get_recipe_totals(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    if recipe_ids:
+        apply_difference(
+            [user_id], get_difference({}, get_recipe_totals(recipe_ids)))
+
+
+def rebuild(user_ids=None):
+    items = ShoppingListItem.objects.all()
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        items = items.filter(user_id__in=user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+    rows = carts.values(
+        'user', name=F('recipe__recipes_ingredients__ingredient__name'),
+        measurement_unit=F('recipe__recipes_ingredients__canonical_unit')
+    ).annotate(
+        amount=Sum('recipe__recipes_ingredients__canonical_amount')
+    ).filter(name__isnull=False).order_by()
+    with transaction.atomic():
+        if user_ids is not None:
+            lock_users(user_ids)
+        items.delete()
+        created = ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(user_id=row['user'], name=row['name'],
+                              measurement_unit=row['measurement_unit'],
+                              amount=row['amount'])
+             for row in rows.iterator()),
+            batch_size=1000)
+    return len(created)
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import catalogue_cache, recipe_cache
+from .models import Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+from .search import remove_from_ingredient_index, update_search_vector
+from .shopping_list import (apply_difference, get_cart_users,
+                            get_difference, get_recipe_totals, rebuild)
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+NORMALIZATION_FIELDS = ('name', 'measurement_unit', 'density')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_catalogue(sender, **kwargs):
+    name = sender._meta.label_lower
+    transaction.on_commit(lambda: catalogue_cache.invalidate(name))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipes(sender, **kwargs):
+    transaction.on_commit(recipe_cache.invalidate)
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+    transaction.on_commit(recipe_cache.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_search_vector(sender, instance, **kwargs):
+    update_search_vector(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+@receiver((post_save, pre_delete), sender=Tag)
+def touch_recipes(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    lookup = 'tags' if sender is Tag else 'recipes_ingredients__ingredient'
+    Recipe.objects.filter(**{lookup: instance}).update(
+        updated_at=timezone.now())
+    transaction.on_commit(recipe_cache.invalidate)
+
+
+def get_normalization_state(ingredient):
+    return tuple(getattr(ingredient, field) for field in NORMALIZATION_FIELDS)
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_normalization_state(sender, instance, update_fields, **kwargs):
+    instance._normalization_state = None
+    if instance.pk is None or (
+            update_fields is not None
+            and not set(NORMALIZATION_FIELDS).intersection(update_fields)):
+        return
+    instance._normalization_state = Ingredient.objects.filter(
+        pk=instance.pk).values_list(*NORMALIZATION_FIELDS).first()
+
+
+@receiver(post_save, sender=Ingredient)
+def renormalize_amounts(sender, instance, created, **kwargs):
+    previous = instance._normalization_state
+    if created or previous in (None, get_normalization_state(instance)):
+        return
+    recipe_ingredients = list(
+        RecipeIngredient.objects.filter(ingredient=instance))
+    for recipe_ingredient in recipe_ingredients:
+        recipe_ingredient.ingredient = instance
+        recipe_ingredient.normalize()
+    RecipeIngredient.objects.bulk_update(
+        recipe_ingredients, ('canonical_amount', 'canonical_unit'),
+        batch_size=500)
+    rebuild(ShoppingCart.objects.filter(
+        recipe__recipes_ingredients__ingredient=instance
+    ).values_list('user_id', flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    cart_users = get_cart_users(instance.pk)
+    if cart_users:
+        apply_difference(cart_users, get_difference(
+            {}, get_recipe_totals([instance.pk])))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def drop_from_ingredient_index(sender, instance, **kwargs):
+    remove_from_ingredient_index(Recipe.objects.all(), instance.pk)
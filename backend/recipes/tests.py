@@ -0,0 +1,215 @@
+import base64
+import io
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from users.models import Subscribe
+from .models import (Ingredient, Recipe, RecipeIngredient, ShoppingListItem,
+                     Tag, TagRecipe, TimelineEntry)
+from .shopping_list import rebuild
+from .timeline import publish
+
+User = get_user_model()
+
+
+class RecipeQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password',
+            first_name='Cook', last_name='Cook')
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'tag{index}', color=f'#0000{index:02d}',
+                slug=f'tag{index}')
+            for index in range(2))
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {index}', measurement_unit='г')
+            for index in range(30))
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=cls.user, name=f'recipe {index}', text='text',
+                   cooking_time=10, image='recipes/images/recipe.png')
+            for index in range(12))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=10).normalize()
+            for recipe in recipes
+            for ingredient in cls.ingredients[:3])
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in cls.tags)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def count_queries(self, request, *args):
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args)
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries)
+
+    def test_recipe_list_queries_do_not_depend_on_page_size(self):
+        expected = self.count_queries(self.client.get, '/api/recipes/?limit=2')
+        with self.assertNumQueries(expected):
+            response = self.client.get('/api/recipes/?limit=10')
+        self.assertEqual(len(response.data['results']), 10)
+
+    def create_recipe(self, ingredients):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+        return self.client.post('/api/recipes/', {
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [{'id': ingredient.id, 'amount': 10}
+                            for ingredient in ingredients],
+            'image': ('data:image/png;base64,'
+                      + base64.b64encode(buffer.getvalue()).decode()),
+            'name': 'new recipe',
+            'text': 'text',
+            'cooking_time': 10,
+        }, format='json')
+
+    def test_recipe_create_queries_do_not_depend_on_ingredients(self):
+        expected = self.count_queries(
+            self.create_recipe, self.ingredients[:1])
+        with self.assertNumQueries(expected):
+            response = self.create_recipe(self.ingredients)
+        self.assertEqual(len(response.data['ingredients']), 30)
+
+
+class ShoppingListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password', first_name='Author', last_name='Author')
+        cls.buyer = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='password',
+            first_name='Buyer', last_name='Buyer')
+        cls.flour, cls.sugar, cls.milk = Ingredient.objects.bulk_create((
+            Ingredient(name='flour', measurement_unit='г'),
+            Ingredient(name='sugar', measurement_unit='кг'),
+            Ingredient(name='milk', measurement_unit='мл'),
+        ))
+        cls.pancakes, cls.cake = (
+            Recipe.objects.create(
+                author=cls.author, name=name, text='text', cooking_time=10,
+                image='recipes/images/recipe.png')
+            for name in ('pancakes', 'cake'))
+        for recipe, ingredient, amount in (
+                (cls.pancakes, cls.flour, 200), (cls.pancakes, cls.milk, 300),
+                (cls.cake, cls.flour, 500), (cls.cake, cls.sugar, 1)):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount)
+
+    def shopping_list(self):
+        return {(item.name, item.measurement_unit): item.amount
+                for item in ShoppingListItem.objects.filter(user=self.buyer)}
+
+    def assertShoppingList(self, expected):
+        self.assertEqual(self.shopping_list(), expected)
+        rebuild([self.buyer.pk])
+        self.assertEqual(self.shopping_list(), expected)
+
+    def add_to_cart(self, *recipes):
+        self.client.force_authenticate(self.buyer)
+        for recipe in recipes:
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def test_cart_add_and_remove_update_list(self):
+        self.add_to_cart(self.pancakes, self.cake)
+        self.assertShoppingList({
+            ('flour', 'г'): 700, ('milk', 'мл'): 300, ('sugar', 'г'): 1000})
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertShoppingList({('flour', 'г'): 500, ('sugar', 'г'): 1000})
+
+    def test_recipe_update_applies_difference(self):
+        self.add_to_cart(self.pancakes, self.cake)
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.pancakes.id}/', {
+                'ingredients': [{'id': self.flour.id, 'amount': 250},
+                                {'id': self.sugar.id, 'amount': 2}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertShoppingList({('flour', 'г'): 750, ('sugar', 'г'): 3000})
+
+    def test_recipe_delete_removes_from_list(self):
+        self.add_to_cart(self.pancakes, self.cake)
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.cake.id}/')
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertShoppingList({('flour', 'г'): 200, ('milk', 'мл'): 300})
+
+    def test_ingredient_save_renormalizes_only_on_change(self):
+        self.add_to_cart(self.pancakes)
+        with CaptureQueriesContext(connection) as queries:
+            self.milk.save()
+            self.milk.save(update_fields=('name',))
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "recipes_recipeingredient"')
+            for query in queries))
+        self.milk.density = Decimal('1.03')
+        self.milk.save()
+        self.assertShoppingList({('flour', 'г'): 200, ('milk', 'г'): 309})
+
+
+class RecipeUploadTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(
+            username='cook', email='cook@example.com', password='password',
+            first_name='Cook', last_name='Cook'))
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=1024)
+    def test_oversized_body_is_rejected_before_parsing(self):
+        response = self.client.post('/api/recipes/', {
+            'image': 'data:image/png;base64,' + 'A' * 128 * 1024,
+        }, format='json')
+        self.assertEqual(response.status_code, 413, response.content)
+
+
+class RecipePaginationTests(APITestCase):
+    def test_cursor_mode_rejects_custom_ordering(self):
+        for query in ('ordering=-favorites_count', 'search=soup',
+                      'ingredients=1'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f'/api/recipes/?paginate=cursor&{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(query.split('=')[0], response.data)
+
+    def test_cursor_mode_without_ordering(self):
+        response = self.client.get('/api/recipes/?paginate=cursor')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('next', response.data)
+
+
+class TimelineTests(APITestCase):
+    def test_publish_reaches_followers_without_counter(self):
+        author, follower = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                password='password', first_name=name, last_name=name)
+            for name in ('author', 'follower'))
+        Subscribe.objects.create(user=follower, author=author)
+        recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=10,
+            image='recipes/images/recipe.png')
+        publish(recipe)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower, recipe=recipe).exists())
@@ -0,0 +1,59 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Subscribe
+from .background import run_on_commit
+from .models import Recipe, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def publish(recipe):
+    followers = Subscribe.objects.filter(author_id=recipe.author_id).count()
+    if followers > settings.TIMELINE_FAN_OUT_LIMIT:
+        TimelineEntry.objects.create(
+            author_id=recipe.author_id, recipe=recipe,
+            pub_date=recipe.pub_date)
+    elif followers > settings.TIMELINE_INLINE_FAN_OUT:
+        run_on_commit(fan_out, recipe.pk, recipe.author_id, recipe.pub_date)
+    elif followers:
+        fan_out(recipe.pk, recipe.author_id, recipe.pub_date)
+
+
+def fan_out(recipe_id, author_id, pub_date):
+    follower_ids = Subscribe.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator(chunk_size=BATCH_SIZE)
+    while batch := list(islice(follower_ids, BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, author_id=author_id,
+                           recipe_id=recipe_id, pub_date=pub_date)
+             for user_id in batch],
+            ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    recipes = Recipe.objects.filter(author_id=author_id).exclude(
+        pk__in=TimelineEntry.objects.filter(
+            author_id=author_id, user__isnull=True).values('recipe')
+    ).order_by('-pub_date').values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, author_id=author_id,
+                       recipe_id=recipe_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def forget(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed(user):
+    return TimelineEntry.objects.filter(
+        Q(user=user)
+        | Q(user__isnull=True, author__in=Subscribe.objects.filter(
+            user=user).values('author'))
+    )
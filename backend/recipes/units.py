@@ -0,0 +1,73 @@
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+MASS = 'mass'
+VOLUME = 'volume'
+
+Unit = namedtuple('Unit', ('dimension', 'factor'))
+
+BASE_UNITS = {
+    MASS: 'г',
+    VOLUME: 'мл',
+}
+
+UNITS = {
+    'мг': Unit(MASS, Decimal('0.001')),
+    'г': Unit(MASS, Decimal(1)),
+    'кг': Unit(MASS, Decimal(1000)),
+    'мл': Unit(VOLUME, Decimal(1)),
+    'л': Unit(VOLUME, Decimal(1000)),
+    'капля': Unit(VOLUME, Decimal('0.05')),
+    'ч. л.': Unit(VOLUME, Decimal(5)),
+    'ст. л.': Unit(VOLUME, Decimal(15)),
+    'стакан': Unit(VOLUME, Decimal(250)),
+}
+
+ALIASES = {
+    'гр': 'г',
+    'грамм': 'г',
+    'килограмм': 'кг',
+    'миллилитр': 'мл',
+    'литр': 'л',
+    'ч.л.': 'ч. л.',
+    'чайная ложка': 'ч. л.',
+    'ст.л.': 'ст. л.',
+    'столовая ложка': 'ст. л.',
+}
+
+DISPLAY_UNITS = {
+    'г': ('кг', Decimal(1000)),
+    'мл': ('л', Decimal(1000)),
+}
+
+PRECISION = Decimal('0.001')
+
+
+def normalize_unit(unit):
+    unit = ' '.join(unit.lower().split())
+    for candidate in (unit, unit.rstrip('.')):
+        candidate = ALIASES.get(candidate, candidate)
+        if candidate in UNITS:
+            return candidate
+    return unit
+
+
+def canonicalize(amount, unit, density=None):
+    unit = normalize_unit(unit)
+    amount = Decimal(amount)
+    if unit not in UNITS:
+        return amount.quantize(PRECISION, ROUND_HALF_UP), unit
+    dimension, factor = UNITS[unit]
+    amount *= factor
+    if dimension == VOLUME and density:
+        amount *= Decimal(density)
+        dimension = MASS
+    return amount.quantize(PRECISION, ROUND_HALF_UP), BASE_UNITS[dimension]
+
+
+def humanize(amount, unit):
+    larger = DISPLAY_UNITS.get(unit)
+    if larger is not None and amount >= larger[1]:
+        unit, amount = larger[0], amount / larger[1]
+    amount = Decimal(amount).quantize(PRECISION, ROUND_HALF_UP).normalize()
+    return f'{amount:f}', unit
@@ -22,7 +22,15 @@ urlpatterns = [
                 'post': 'add_to_shopping_cart',
                 'delete': 'delete_from_shopping_cart'
             })),
-    path('recipes/download_shopping_cart/',
-         RecipeViewSet.as_view({'get': 'download_shopping_cart'})),
+    path('recipes/favorite/',
+         FavoriteViewSet.as_view({
+             'post': 'bulk_add_to_favorite',
+             'delete': 'bulk_delete_from_favorite'
+         })),
+    path('recipes/shopping_cart/',
+         ShoppingCartViewSet.as_view({
+             'post': 'bulk_add_to_shopping_cart',
+             'delete': 'bulk_delete_from_shopping_cart'
+         })),
     path('', include(router.urls)),
 ]
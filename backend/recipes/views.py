@@ -1,61 +1,278 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q, Subquery, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, exceptions
+from rest_framework import exceptions, generics, viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_403_FORBIDDEN)
 
-from users.pagination import CustomPageNumberPagination
+from users.models import Subscribe
+from .cache import (catalogue_cache, get_not_modified_response, make_etag,
+                    recipe_cache, set_validators)
+from .counters import (RECIPE_COUNTERS, change_counter,
+                       recount_recipe_counter)
 from .filters import RecipeFilter, IngredientSearchFilter
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
-from .pagination import CustomDataPagination
+from . import shopping_list, timeline
+from .images import schedule_image_variants
+from .models import (Favorite, Ingredient, Recipe, RecipeNeighbour,
+                     ShoppingCart, ShoppingListItem, Tag)
+from .pagination import CustomDataPagination, RecipePagination
+from .parsers import RecipeJSONParser, RecipeMultiPartParser
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer)
+                          RecipeIdsSerializer, RecipeSerializer,
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
+                          TagSerializer, get_recipe_prefetches)
 from .permissions import CustomIsAuthenticated
 
+User = get_user_model()
+
+
+THUMBNAIL_ACTIONS = ('list', 'similar', 'recommended', 'feed')
+POPULARITY_ORDERINGS = {'favorites_count', 'in_carts_count'}
+USER_STATE_FIELDS = (
+    'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed')
+
+
+def get_user_state(user):
+    if not user.is_authenticated:
+        return ()
+    state = {}
+    for name, model in (('favorites', Favorite),
+                        ('shopping_cart', ShoppingCart),
+                        ('subscriptions', Subscribe)):
+        rows = model.objects.filter(
+            user=OuterRef('pk')).order_by().values('user')
+        state[f'{name}_count'] = Subquery(
+            rows.annotate(value=Count('id')).values('value'))
+        state[f'{name}_last'] = Subquery(
+            rows.annotate(value=Max('id')).values('value'))
+    return (user.pk, *User.objects.filter(pk=user.pk).annotate(
+        **state).values_list(*state).get())
+
+
+def get_limit(request, default, maximum=100):
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        return default
+    return min(max(limit, 1), maximum)
+
 
 def create_func(request, recipe_id, model, arg):
     try:
         user, recipe = request.user, Recipe.objects.get(id=recipe_id)
     except Recipe.DoesNotExist:
         raise exceptions.ValidationError({'error': 'Recipe does not exist'})
-    if model.objects.filter(user=user, recipe=recipe).exists():
+    try:
+        with transaction.atomic():
+            add_to_smth = model.objects.create(user=user,
+                                               recipe=recipe)
+            change_counter(Recipe.objects.filter(pk=recipe.pk),
+                           RECIPE_COUNTERS[model], 1)
+            if model is ShoppingCart:
+                shopping_list.add_recipes(user.pk, [recipe.pk])
+    except IntegrityError:
         raise exceptions.ValidationError(
             {'errors': 'You already add this recipe to smth'})
-    add_to_smth = model.objects.create(user=user,
-                                       recipe=recipe)
     serializer = arg(add_to_smth,
                      context={'request': request})
     return Response(serializer.data, status=HTTP_201_CREATED)
 
 
 def remove_func(request, recipe_id, model):
-    user = request.user
-    recipe = get_object_or_404(Recipe, id=recipe_id)
-    is_in_smth = model.objects.filter(user=user,
-                                      recipe=recipe)
-    if is_in_smth.exists():
-        is_in_smth.delete()
+    with transaction.atomic():
+        deleted, _ = model.objects.filter(user=request.user,
+                                          recipe_id=recipe_id).delete()
+        if deleted:
+            change_counter(Recipe.objects.filter(pk=recipe_id),
+                           RECIPE_COUNTERS[model], -1)
+            if model is ShoppingCart:
+                shopping_list.remove_recipes(request.user.pk, [recipe_id])
+    if deleted:
         return Response(status=HTTP_204_NO_CONTENT)
-    else:
-        raise exceptions.ValidationError({'error': 'Recipe is not in smth'})
+    get_object_or_404(Recipe, id=recipe_id)
+    raise exceptions.ValidationError({'error': 'Recipe is not in smth'})
+
+
+def get_recipe_ids(request):
+    serializer = RecipeIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+
+def bulk_create_func(request, model, arg):
+    user, recipe_ids = request.user, get_recipe_ids(request)
+    recipes = Recipe.objects.in_bulk(recipe_ids)
+    with transaction.atomic():
+        if model is ShoppingCart:
+            shopping_list.lock_users([user.pk])
+        existing = set(model.objects.filter(
+            user=user, recipe_id__in=recipes
+        ).values_list('recipe_id', flat=True))
+        new_ids = [recipe_id for recipe_id in recipes
+                   if recipe_id not in existing]
+        model.objects.bulk_create(
+            [model(user=user, recipe=recipes[recipe_id])
+             for recipe_id in new_ids],
+            ignore_conflicts=True)
+        recount_recipe_counter(model, new_ids)
+        if model is ShoppingCart:
+            shopping_list.add_recipes(user.pk, new_ids)
+    results = []
+    for recipe_id in recipe_ids:
+        if recipe_id not in recipes:
+            results.append({'id': recipe_id, 'status': 'not_found'})
+            continue
+        data = arg(model(user=user, recipe=recipes[recipe_id]),
+                   context={'request': request}).data
+        data['status'] = 'exists' if recipe_id in existing else 'added'
+        results.append(data)
+    return Response(results)
+
+
+def bulk_remove_func(request, model):
+    user, recipe_ids = request.user, get_recipe_ids(request)
+    with transaction.atomic():
+        removed = set(model.objects.select_for_update().filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        model.objects.filter(user=user, recipe_id__in=removed).delete()
+        recount_recipe_counter(model, removed)
+        if model is ShoppingCart:
+            shopping_list.remove_recipes(user.pk, removed)
+    missing = set(recipe_ids) - removed
+    if missing:
+        missing -= set(Recipe.objects.filter(
+            id__in=missing).values_list('id', flat=True))
+    return Response([
+        {'id': recipe_id,
+         'status': ('removed' if recipe_id in removed
+                    else 'not_found' if recipe_id in missing
+                    else 'absent')}
+        for recipe_id in recipe_ids
+    ])
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = CustomPageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
     permission_classes = (CustomIsAuthenticated,)
+    parser_classes = (RecipeJSONParser, RecipeMultiPartParser)
+
+    def get_queryset(self):
+        queryset = self.annotate_user_state(super().get_queryset())
+        if self.request.method in SAFE_METHODS:
+            queryset = self.get_read_queryset(queryset)
+        return queryset
+
+    def annotate_user_state(self, queryset):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def get_read_queryset(self, queryset):
+        return queryset.select_related('author').defer(
+            'search_vector', 'ingredient_ids'
+        ).prefetch_related(*get_recipe_prefetches())
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return recipe_cache.response(
+                request, lambda: self.conditional_list(
+                    request, *args, **kwargs))
+        return self.conditional_list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return recipe_cache.response(
+                request, lambda: self.conditional_retrieve(
+                    request, *args, **kwargs))
+        return self.conditional_retrieve(request, *args, **kwargs)
+
+    def conditional_list(self, request, *args, **kwargs):
+        if POPULARITY_ORDERINGS & {
+                field.strip().lstrip('-')
+                for value in request.query_params.getlist('ordering')
+                for field in value.split(',')}:
+            return super().list(request, *args, **kwargs)
+        state = self.filter_queryset(Recipe.objects.all()).aggregate(
+            count=Count('id'), updated_at=Max('updated_at'))
+        etag = make_etag(
+            'recipe-list', request.accepted_renderer.format,
+            sorted(request.query_params.lists()), state['count'],
+            state['updated_at'], *get_user_state(request.user))
+        return self.conditional(
+            request, etag, state['updated_at'],
+            super().list, request, *args, **kwargs)
+
+    def conditional_retrieve(self, request, *args, **kwargs):
+        fields = ('updated_at',)
+        if request.user.is_authenticated:
+            fields += USER_STATE_FIELDS
+        state = generics.get_object_or_404(
+            self.annotate_user_state(Recipe.objects.all()).values_list(
+                *fields),
+            pk=kwargs[self.lookup_field])
+        etag = make_etag(
+            'recipe', kwargs[self.lookup_field],
+            request.accepted_renderer.format, request.user.pk, *state)
+        return self.conditional(
+            request, etag, state[0],
+            super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, request, etag, updated_at, view, *args, **kwargs):
+        last_modified = None
+        if updated_at is not None and not request.user.is_authenticated:
+            last_modified = int(updated_at.timestamp())
+        not_modified = get_not_modified_response(
+            request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(view(*args, **kwargs), etag, last_modified)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['image_variant'] = (
+            'thumbnail' if self.action in THUMBNAIL_ACTIONS else 'full')
+        return context
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            recipe = serializer.save(author=self.request.user)
+            change_counter(User.objects.filter(pk=self.request.user.pk),
+                           'recipes_count', 1)
+            schedule_image_variants(recipe)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            recipe = serializer.save()
+            if 'image' in serializer.validated_data:
+                schedule_image_variants(recipe)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            change_counter(User.objects.filter(pk=instance.author_id),
+                           'recipes_count', -1)
 
     def update(self, request, *args, **kwargs):
         recipe = self.get_object()
@@ -69,42 +286,113 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(status=HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
-    @action(detail=False, methods=['get'], url_path='download_shopping_cart')
+    @action(detail=False, methods=['get'], url_path='download_shopping_cart',
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(PlainTextRenderer, CSVRenderer, PDFRenderer))
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart_items = ShoppingCart.objects.filter(user=user)
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in=[item.recipe for item in shopping_cart_items]
-        )
-        ingredients_info = ingredients.values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        content = ""
-        for info in ingredients_info:
-            content += (f"{info['ingredient__name']}: {info['amount']} "
-                        f"{info['ingredient__measurement_unit']}\n")
-
-        response = HttpResponse(
-            content, content_type='application/octet-stream'
+        ingredients_info = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values('name', 'measurement_unit', 'amount')
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients_info.iterator()),
+            content_type=content_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart_info.txt"'
+            'attachment; '
+            f'filename="shopping_cart_info.{renderer.format}"'
         )
         return response
 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        recipe = generics.get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        neighbour_ids = RecipeNeighbour.objects.filter(
+            recipe=recipe
+        ).values_list('neighbour_id', flat=True)[:settings.RECIPE_NEIGHBOURS]
+        recipes = self.get_recipes_in_order(list(neighbour_ids))
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,))
+    def recommended(self, request):
+        user, limit = request.user, get_limit(
+            request, settings.RECOMMENDED_RECIPES_LIMIT)
+        favorites = Favorite.objects.filter(user=user).values('recipe')
+        cart = ShoppingCart.objects.filter(user=user).values('recipe')
+        recipe_ids = list(RecipeNeighbour.objects.filter(
+            Q(recipe__in=favorites) | Q(recipe__in=cart)
+        ).exclude(
+            Q(neighbour__in=favorites) | Q(neighbour__in=cart)
+            | Q(neighbour__author=user)
+        ).values('neighbour').annotate(
+            total=Sum('score')
+        ).order_by('-total').values_list('neighbour', flat=True)[:limit])
+        if not recipe_ids:
+            recipe_ids = list(Recipe.objects.exclude(
+                Q(pk__in=favorites) | Q(pk__in=cart) | Q(author=user)
+            ).order_by(
+                '-favorites_count', '-pub_date'
+            ).values_list('id', flat=True)[:limit])
+        recipes = self.get_recipes_in_order(recipe_ids)
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        entries = timeline.get_feed(request.user).only(
+            'id', 'recipe_id', 'pub_date')
+        page = self.paginate_queryset(entries)
+        recipes = self.get_recipes_in_order(
+            [entry.recipe_id for entry in
+             (entries if page is None else page)])
+        serializer = self.get_serializer(recipes, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    def get_recipes_in_order(self, recipe_ids):
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        return [recipes[pk] for pk in recipe_ids if pk in recipes]
+
+    @action(detail=False, methods=['get'], url_path='shopping_list',
+            permission_classes=(IsAuthenticated,))
+    def shopping_list_summary(self, request):
+        serializer = ShoppingListItemSerializer(
+            ShoppingListItem.objects.filter(user=request.user), many=True)
+        return Response(serializer.data)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class CatalogueMixin:
+    pagination_class = None
+    filter_params = ()
+
+    def list(self, request, *args, **kwargs):
+        if any(request.query_params.get(param)
+               for param in self.filter_params):
+            return super().list(request, *args, **kwargs)
+        return catalogue_cache.response(
+            request, self.queryset.model._meta.label_lower,
+            self.render_catalogue)
+
+    def render_catalogue(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return JSONRenderer().render(serializer.data)
+
+
+class TagViewSet(CatalogueMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = CustomDataPagination
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogueMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    pagination_class = CustomDataPagination
     filter_backends = (IngredientSearchFilter,)
+    filter_params = (IngredientSearchFilter.search_param,)
     search_fields = ('^name',)
 
 
@@ -122,6 +410,14 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def delete_from_favorite(self, request, recipe_id):
         return remove_func(request, recipe_id, Favorite)
 
+    @action(detail=False, methods=['post'], url_path='favorite')
+    def bulk_add_to_favorite(self, request):
+        return bulk_create_func(request, Favorite, FavoriteSerializer)
+
+    @action(detail=False, methods=['delete'], url_path='favorite')
+    def bulk_delete_from_favorite(self, request):
+        return bulk_remove_func(request, Favorite)
+
 
 class ShoppingCartViewSet(viewsets.ModelViewSet):
     queryset = ShoppingCart.objects.all()
@@ -137,3 +433,12 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'], url_path='shopping_cart',)
     def delete_from_shopping_cart(self, request, recipe_id):
         return remove_func(request, recipe_id, ShoppingCart)
+
+    @action(detail=False, methods=['post'], url_path='shopping_cart')
+    def bulk_add_to_shopping_cart(self, request):
+        return bulk_create_func(request, ShoppingCart,
+                                ShoppingCartSerializer)
+
+    @action(detail=False, methods=['delete'], url_path='shopping_cart')
+    def bulk_delete_from_shopping_cart(self, request):
+        return bulk_remove_func(request, ShoppingCart)
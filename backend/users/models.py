@@ -12,6 +12,10 @@ class User(AbstractUser):
         max_length=32, verbose_name='First Name')
     last_name = models.CharField(
         max_length=32, verbose_name='Last Name')
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Recipes count')
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Subscribers count')
 
     class Meta:
         verbose_name = 'User'
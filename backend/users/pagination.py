@@ -1,5 +1,44 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class CustomCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = ('-id',)
+
+
+class HybridPagination(CustomPageNumberPagination):
+    cursor_pagination_class = CustomCursorPagination
+    cursor_ordering = ('-id',)
+    mode_query_param = 'paginate'
+    cursor_unsupported_params = ()
+
+    def use_cursor(self, request):
+        return (
+            CustomCursorPagination.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if not self.use_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        unsupported = [param for param in self.cursor_unsupported_params
+                       if request.query_params.get(param)]
+        if unsupported:
+            raise ValidationError({
+                param: 'Not supported with cursor pagination.'
+                for param in unsupported})
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.cursor_paginator.ordering = self.cursor_ordering
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -11,6 +11,8 @@ User = get_user_model()
 
 
 def get_is_subscribed(obj, serializer_field):
+    if hasattr(obj, 'is_subscribed'):
+        return obj.is_subscribed
     request = serializer_field.context.get('request')
     if request is None or not request.user.is_authenticated:
         return False
@@ -58,15 +60,22 @@ class SubscribeSerializer(serializers.ModelSerializer):
                                                      'recipes_count',)
 
     def get_is_subscribed(self, obj):
+        request = self.context.get('request')
+        if request is not None and obj.user_id == request.user.id:
+            return True
         return get_is_subscribed(obj.author, self)
 
     def get_recipes(self, obj):
-        recipes = Recipe.objects.filter(author=obj.author)
-        limit = self.context['request'].query_params.get('recipes_limit')
-        if limit is not None:
-            recipes = recipes[:int(limit)]
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            recipes = recipes_by_author[obj.author_id]
+        else:
+            recipes = Recipe.objects.filter(author=obj.author)
+            limit = self.context['request'].query_params.get(
+                'recipes_limit')
+            if limit is not None:
+                recipes = recipes[:int(limit)]
         return RecipeShortInfoSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        recipes = Recipe.objects.filter(author=obj.author)
-        return recipes.count()
+        return obj.author.recipes_count
@@ -1,14 +1,23 @@
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 
 from djoser.views import UserViewSet
-from .pagination import CustomPageNumberPagination
+from recipes import timeline
+from recipes.counters import change_counter
+from recipes.models import Recipe
+from .pagination import CustomPageNumberPagination, HybridPagination
 from .models import Subscribe
 from .serializers import CustomUserSerializer, SubscribeSerializer
 
@@ -26,21 +35,50 @@ class SubscribeViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = SubscribeSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = CustomPageNumberPagination
+    pagination_class = HybridPagination
 
     @action(detail=False, methods=['get'], url_path='subscriptions')
     def subscriptions(self, request):
         user = request.user
-        subscriptions = Subscribe.objects.filter(user=user)
-        context = {'request': request}
+        subscriptions = Subscribe.objects.filter(
+            user=user
+        ).select_related('author').order_by('-id')
         page = self.paginate_queryset(subscriptions)
-        if page is not None:
-            serializer = SubscribeSerializer(page, many=True, context=context)
+        if page is None:
+            page = list(subscriptions)
+        context = {
+            'request': request,
+            'recipes_by_author': self.get_recipes_by_author(
+                [subscription.author_id for subscription in page],
+                request.query_params.get('recipes_limit')),
+        }
+        serializer = SubscribeSerializer(page, many=True, context=context)
+        if self.paginator is not None:
             return self.get_paginated_response(serializer.data)
-        serializer = SubscribeSerializer(subscriptions, many=True,
-                                         context=context)
         return Response(serializer.data)
 
+    def get_recipes_by_author(self, author_ids, limit):
+        recipes = Recipe.objects.filter(author_id__in=author_ids)
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if limit < 0:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError(
+                    {'recipes_limit': 'Must be a non-negative integer.'})
+            recipes = recipes.annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('pub_date').desc(),
+            )).filter(row_number__lte=limit)
+        recipes_by_author = defaultdict(list)
+        for recipe in recipes.only(
+                'id', 'author_id', 'name', 'image', 'image_thumbnail',
+                'cooking_time'):
+            recipes_by_author[recipe.author_id].append(recipe)
+        return recipes_by_author
+
     @action(detail=True, methods=['post'], url_path='subscribe')
     def subscribe(self, request, user_id):
         user = request.user
@@ -48,22 +86,31 @@ class SubscribeViewSet(viewsets.ModelViewSet):
         if user == to_user:
             return Response({'errors': 'You cannot subscribe yourself'},
                             status=HTTP_400_BAD_REQUEST)
-        if Subscribe.objects.filter(user=user, author=to_user).exists():
+        try:
+            with transaction.atomic():
+                subscription = Subscribe.objects.create(user=user,
+                                                        author=to_user)
+                change_counter(User.objects.filter(pk=to_user.pk),
+                               'subscribers_count', 1)
+                timeline.backfill(user.pk, to_user.pk)
+        except IntegrityError:
             return Response({'errors': 'You already subscribed this user'},
                             status=HTTP_400_BAD_REQUEST)
-        subscription = Subscribe.objects.create(user=user, author=to_user)
         serializer = SubscribeSerializer(subscription,
                                          context={'request': request})
         return Response(serializer.data, status=HTTP_201_CREATED)
 
     @action(detail=True, methods=['delete'], url_path='subscribe')
     def unsubscribe(self, request, user_id):
-        user = request.user
-        to_user = get_object_or_404(User, id=user_id)
-        subscription = Subscribe.objects.filter(user=user, author=to_user)
-        if subscription.exists():
-            subscription.delete()
-        else:
+        with transaction.atomic():
+            deleted, _ = Subscribe.objects.filter(
+                user=request.user, author_id=user_id).delete()
+            if deleted:
+                change_counter(User.objects.filter(pk=user_id),
+                               'subscribers_count', -1)
+                timeline.forget(request.user.pk, user_id)
+        if not deleted:
+            get_object_or_404(User, id=user_id)
             return Response({'error': 'Subscription does not exist'},
                             status=HTTP_400_BAD_REQUEST)
         return Response(status=HTTP_204_NO_CONTENT)